@@ -5,18 +5,28 @@
 Server configuration
 """
 import os
-from os import R_OK, access
-from os.path import isfile
-from typing import Optional
+import re
+import threading
+from stat import S_ISREG
+from typing import Any, Optional, Union
 
+import yaml
 from attrs import frozen
 from smartapp.converter import StandardConverter
-
-# We read this environment variable to find the server configuration YAML file on disk
 from smartapp.interface import SmartAppDispatcherConfig
 
+# Prefer the libyaml-backed loader, which is much faster than the pure-Python one
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader as _YamlLoader  # type: ignore[assignment]
+
+# We read this environment variable to find the server configuration YAML file on disk
 CONFIG_VAR = "SENSORTRACK_CONFIG_PATH"
 
+# Matches constructs like {VAR} in the server configuration, capturing the variable name
+_ENVVAR_PATTERN = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
 
 @frozen
 class ConfigError(Exception):
@@ -60,36 +70,59 @@ class ServerConfig:
 
 
 _CONFIG: Optional[ServerConfig] = None
+_CONFIG_LOCK = threading.Lock()
 _CONVERTER = StandardConverter()
 
 
+def load_yaml(source: Union[str, bytes]) -> Any:
+    """Safely parse a YAML document, using the libyaml C loader when it is available."""
+    return yaml.load(source, Loader=_YamlLoader)
+
+
+def _envvar(match: re.Match[str]) -> str:
+    """Look up the environment variable for a {VAR} construct, failing if it is not set."""
+    try:
+        return os.environ[match.group(1)]
+    except KeyError as e:
+        raise ConfigError("Server configuration references environment variable %s, which is not set" % match.group(1)) from e
+
+
 def _replace_envvars(source: str) -> str:
     """Replace constructs like {VAR} with environment variables."""
-    return source.format(**os.environ)
+    return _ENVVAR_PATTERN.sub(_envvar, source)
 
 
 def _load_config(config_path: Optional[str] = None) -> ServerConfig:
     """Load server configuration from disk, substituting environment variables of the form {VAR}."""
     if not config_path:
-        config_path = os.environ[CONFIG_VAR] if CONFIG_VAR in os.environ else None
+        config_path = os.environ.get(CONFIG_VAR)
         if not config_path:
             raise ConfigError("Server is not properly configured, no $%s found" % CONFIG_VAR)
-    if not (isfile(config_path) and access(config_path, R_OK)):
-        raise ConfigError("Server configuration is not readable: %s" % config_path)
-    with open(config_path, "r", encoding="utf8") as fp:
-        normalized = _replace_envvars(fp.read())
-        return _CONVERTER.from_yaml(normalized, ServerConfig)
+    try:
+        if not S_ISREG(os.stat(config_path).st_mode):
+            raise ConfigError("Server configuration is not readable: %s" % config_path)
+        with open(config_path, "r", encoding="utf8") as fp:
+            source = fp.read()
+    except OSError as e:
+        raise ConfigError("Server configuration is not readable: %s" % config_path) from e
+    # The config file is small, and substitution returns the original string if there are no variables to replace
+    return _CONVERTER.structure(load_yaml(_replace_envvars(source)), ServerConfig)
 
 
 def reset() -> None:
     """Reset the config singleton, forcing it to be reloaded when next used."""
     global _CONFIG  # pylint: disable=global-statement
-    _CONFIG = None
+    with _CONFIG_LOCK:
+        _CONFIG = None
 
 
 def config(config_path: Optional[str] = None) -> ServerConfig:
     """Retrieve server configuration, loading it from disk once and caching it."""
     global _CONFIG  # pylint: disable=global-statement
-    if _CONFIG is None:
-        _CONFIG = _load_config(config_path)
-    return _CONFIG
+    loaded = _CONFIG
+    if loaded is None:
+        with _CONFIG_LOCK:  # double-checked, so concurrent first callers don't each load from disk
+            if _CONFIG is None:
+                _CONFIG = _load_config(config_path)
+            loaded = _CONFIG
+    return loaded
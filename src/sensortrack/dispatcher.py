@@ -4,43 +4,64 @@
 """
 SmartApp dispatcher.
 """
+import atexit
+import threading
+from functools import lru_cache
+from importlib.resources import files
 from typing import Optional
 
-from importlib_resources import files
 from smartapp.converter import CONVERTER
 from smartapp.dispatcher import SmartAppDispatcher
 from smartapp.interface import SmartAppDefinition
 
 import sensortrack.data
 
-from .config import config
+from .config import config, load_yaml
 from .handler import EventHandler
 
 _DEFINITION_FILE = "definition.yaml"  # definition of the SmartApp
 
 
+@lru_cache(maxsize=1)
 def _load_definition() -> SmartAppDefinition:
-    yaml = files(sensortrack.data).joinpath(_DEFINITION_FILE).read_text()
-    return CONVERTER.from_yaml(yaml, SmartAppDefinition)
+    """Load the SmartApp definition from package resources, once, since it is immutable once installed."""
+    yaml = files(sensortrack.data).joinpath(_DEFINITION_FILE).read_bytes()  # the YAML parser decodes bytes itself
+    return CONVERTER.structure(load_yaml(yaml), SmartAppDefinition)
 
 
 _DISPATCHER: Optional[SmartAppDispatcher] = None
-_DEFINITION = _load_definition()
+_DISPATCHER_LOCK = threading.Lock()
+
+
+def _close(loaded: Optional[SmartAppDispatcher]) -> None:
+    """Close the event handler for a dispatcher, flushing any points that are still buffered."""
+    if loaded and isinstance(loaded.event_handler, EventHandler):
+        loaded.event_handler.close()
 
 
 def reset() -> None:
-    """Reset the config singleton, forcing it to be reloaded when next used."""
+    """Reset the dispatcher singleton, closing its event handler and forcing it to be rebuilt when next used."""
     global _DISPATCHER  # pylint: disable=global-statement
-    _DISPATCHER = None
+    with _DISPATCHER_LOCK:
+        _close(_DISPATCHER)
+        _DISPATCHER = None
 
 
 def dispatcher() -> SmartAppDispatcher:
     """Return a dispatcher, loading configuration once and caching the instance."""
     global _DISPATCHER  # pylint: disable=global-statement
-    if _DISPATCHER is None:
-        _DISPATCHER = SmartAppDispatcher(
-            config=config().dispatcher,
-            definition=_DEFINITION,
-            event_handler=EventHandler(),
-        )
-    return _DISPATCHER
+    loaded = _DISPATCHER
+    if loaded is None:
+        with _DISPATCHER_LOCK:  # double-checked, so concurrent first callers don't each build a dispatcher
+            if _DISPATCHER is None:
+                _DISPATCHER = SmartAppDispatcher(
+                    config=config().dispatcher,
+                    definition=_load_definition(),
+                    event_handler=EventHandler(),
+                )
+            loaded = _DISPATCHER
+    return loaded
+
+
+# Registered once, so only the current dispatcher's event handler is closed (and its buffered points flushed) on exit
+atexit.register(reset)
@@ -6,11 +6,16 @@
 SmartApp event handler.
 """
 import logging
-from typing import Any, Dict, List, Optional, Union
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import requests
 from influxdb_client import InfluxDBClient, Point
-from influxdb_client.client.write_api import SYNCHRONOUS
+from influxdb_client.client.write_api import WriteOptions
 from smartapp.interface import (
     ConfigurationRequest,
     ConfirmationRequest,
@@ -35,6 +40,30 @@ from sensortrack.smartthings import (
 from sensortrack.weather import retrieve_current_conditions
 
 WEATHER_LOOKUP = "weather-lookup"  # name/id of the weather lookup timer event
+SENSOR_MEASUREMENT = "sensor"  # InfluxDB measurement for data received from sensors
+WEATHER_MEASUREMENT = "weather"  # InfluxDB measurement for data retrieved from weather.gov
+
+# Points are buffered and written in the background, so bursts of events are coalesced into fewer requests.
+# Intervals are in milliseconds. Failed batches are retried by the client, with exponential backoff, for at most
+# a minute.  On shutdown, we wait at most 10 seconds for buffered points to be flushed, so an unreachable InfluxDB
+# can't hang the server for minutes (the client defaults are 3 minutes of retries and a 5 minute wait on close).
+_WRITE_OPTIONS = WriteOptions(
+    batch_size=500,
+    flush_interval=1_000,
+    jitter_interval=200,
+    max_retry_time=60_000,
+    max_close_wait=10_000,
+)
+
+# Characters that must be escaped in line protocol tag keys, tag values and field keys, the same as Point
+_LINE_PROTOCOL_ESCAPES = str.maketrans({",": "\\,", "=": "\\=", " ": "\\ ", "\n": "\\n", "\t": "\\t", "\r": "\\r"})
+
+# Line protocol template for a sensor record: device and location tags (sorted by key, like Point), attribute field,
+# measurement and timestamp
+_SENSOR_LINE = SENSOR_MEASUREMENT + "%s%s %s=%r %d"
+
+# A record to be persisted to InfluxDB, either a Point or a line protocol string
+Record = Union[Point, str]
 
 
 def is_weather_lookup(event: Dict[str, Any]) -> bool:
@@ -42,10 +71,83 @@ def is_weather_lookup(event: Dict[str, Any]) -> bool:
     return "name" in event and event["name"] == WEATHER_LOOKUP
 
 
+def _round2(measurement: float) -> float:
+    """Round a finite measurement to 2 decimal places, half away from zero; much cheaper than round(measurement, 2)."""
+    scaled = measurement * 100.0
+    if not math.isfinite(scaled):
+        return round(measurement, 2)  # too large to scale, which a real sensor will never report
+    return int(scaled + (0.5 if measurement >= 0 else -0.5)) / 100.0
+
+
+def _tag(key: str, value: Any) -> str:
+    """Build a line protocol tag with its leading comma, or an empty string for a None or empty value, like Point."""
+    if value is None:
+        return ""
+    escaped = str(value).translate(_LINE_PROTOCOL_ESCAPES)
+    if not escaped:
+        return ""
+    if escaped.endswith("\\"):
+        escaped += " "  # otherwise, the trailing backslash would escape the separator that follows
+    return ",%s=%s" % (key, escaped)
+
+
+def sensor_record(event: Dict[str, Any], timestamp: int) -> Optional[str]:
+    """Build a line protocol record for a device event at a timestamp in ns, or None if the measurement is not a finite number."""
+    value = event["value"]
+    measurement = value if isinstance(value, float) else float(value)
+    if not math.isfinite(measurement):
+        return None  # same as a Point, which silently drops fields that line protocol can't represent
+    measurement = _round2(measurement)
+    return _SENSOR_LINE % (
+        _tag("device", event["deviceId"]),
+        _tag("location", event["locationId"]),
+        str(event["attribute"]).translate(_LINE_PROTOCOL_ESCAPES),  # "temperature" or "humidity"
+        measurement,
+        timestamp,
+    )
+
+
+def _log_write_error(batch: Tuple[str, str, str], data: Union[str, bytes], exception: Exception) -> None:
+    """Log a batch of points that could not be persisted to InfluxDB, without logging the points themselves."""
+    bucket, org, precision = batch
+    logging.error(
+        "Failed to persist batch of %d point(s) to InfluxDB [bucket=%s, org=%s, precision=%s]: %s",
+        len(data.splitlines()),
+        bucket,
+        org,
+        precision,
+        exception,
+    )
+
+
+def _log_write_retry(_: Tuple[str, str, str], __: str, exception: Exception) -> None:
+    """Log a retryable failure when persisting a batch of points to InfluxDB."""
+    logging.warning("Retrying failed write to InfluxDB: %s", exception)
+
+
 # noinspection PyMethodMayBeStatic
 class EventHandler(SmartAppEventHandler):
     """SmartApp event handler."""
 
+    def __init__(self) -> None:
+        influxdb = config().influxdb  # configuration is immutable, so we only need to read it once
+        self._influxdb_bucket = influxdb.bucket
+        # The client is thread-safe and designed to be long-lived, so we reuse its connections across events
+        self._client = InfluxDBClient(url=influxdb.url, org=influxdb.org, token=influxdb.token)
+        self._write_api = self._client.write_api(
+            write_options=_WRITE_OPTIONS,
+            error_callback=_log_write_error,
+            retry_callback=_log_write_retry,
+        )
+        # Events are dispatched on a thread pool, but the batching write API feeds an unlocked reactive pipeline
+        # that can silently drop points when written to from several threads at once, so writes are serialized.
+        self._write_lock = threading.Lock()
+
+    def close(self) -> None:
+        """Flush any buffered points and close the InfluxDB client, releasing its connections."""
+        self._write_api.close()
+        self._client.close()
+
     def handle_confirmation(self, correlation_id: Optional[str], request: ConfirmationRequest) -> None:
         """Handle a CONFIRMATION lifecycle request"""
         pass  # no action needed for this event, the standard dispatcher does everything that's needed
@@ -56,12 +158,12 @@ class EventHandler(SmartAppEventHandler):
 
     def handle_install(self, correlation_id: Optional[str], request: InstallRequest) -> None:
         """Handle an INSTALL lifecycle request."""
-        self._handle_config_refresh(correlation_id, request, subscribe=True)
+        self._handle_config_refresh(correlation_id, request, install=True)
 
     def handle_update(self, correlation_id: Optional[str], request: UpdateRequest) -> None:
         """Handle an UPDATE lifecycle request."""
         # Note: no need to subscribe to device events, because the CAPABILITY subscription should already cover all devices
-        self._handle_config_refresh(correlation_id, request, subscribe=False)
+        self._handle_config_refresh(correlation_id, request, install=False)
 
     def handle_uninstall(self, correlation_id: Optional[str], request: UninstallRequest) -> None:
         """Handle an UNINSTALL lifecycle request."""
@@ -73,56 +175,67 @@ class EventHandler(SmartAppEventHandler):
 
     def handle_event(self, correlation_id: Optional[str], request: EventRequest) -> None:
         """Handle an EVENT lifecycle request."""
-        url = config().influxdb.url
-        org = config().influxdb.org
-        token = config().influxdb.token
-        bucket = config().influxdb.bucket
-        with InfluxDBClient(url=url, org=org, token=token) as client:
-            points = []  # type: List[Point]
-            self._handle_weather_lookup_events(correlation_id, request, points)
-            self._handle_sensor_events(request, points)
-            client.write_api(write_options=SYNCHRONOUS).write(bucket=bucket, record=points)
-            logging.debug("[%s] Completed persisting %d point(s) of data", correlation_id, len(points))
+        # Points are written in batches, so InfluxDB would assign the same time to every point in a batch if we let it
+        # do so.  Stamping points on receipt keeps readings that arrive within the same flush interval distinct.
+        timestamp = time.time_ns()
+        points = []  # type: List[Record]
+        self._handle_weather_lookup_events(correlation_id, request, timestamp, points)
+        self._handle_sensor_events(request, timestamp, points)
+        with self._write_lock:
+            self._write_api.write(bucket=self._influxdb_bucket, record=points)
+        logging.debug("[%s] Completed queueing %d point(s) of data", correlation_id, len(points))
 
     def _handle_config_refresh(
-        self, correlation_id: Optional[str], request: Union[InstallRequest, UpdateRequest], subscribe: bool
+        self, correlation_id: Optional[str], request: Union[InstallRequest, UpdateRequest], install: bool
     ) -> None:
         """Handle configuration refresh for an INSTALL or UPDATE event."""
         weather_enabled = request.as_bool("retrieve-weather-enabled")
         weather_cron = request.as_str("retrieve-weather-cron") if weather_enabled else None
         with SmartThings(request=request):
-            schedule_weather_lookup_timer(WEATHER_LOOKUP, weather_enabled, weather_cron)
+            schedule_weather_lookup_timer(WEATHER_LOOKUP, weather_enabled, weather_cron, replace=not install)
             logging.info("[%s] Completed scheduling weather lookup timer", correlation_id)
-            if subscribe:
-                subscribe_to_temperature_events()
-                subscribe_to_humidity_events()
+            if install:
+                # The subscriptions are independent, so we overlap the API calls.  Each call runs in a copy of the
+                # current context, because the SmartThings API context is tracked in a context variable.
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    futures = [
+                        executor.submit(copy_context().run, subscribe_to_temperature_events),
+                        executor.submit(copy_context().run, subscribe_to_humidity_events),
+                    ]
+                    for future in futures:
+                        future.result()  # raises any exception from the underlying call
                 logging.info("[%s] Completed subscribing to device events", correlation_id)
 
-    def _handle_weather_lookup_events(self, correlation_id: Optional[str], request: EventRequest, points: List[Point]) -> None:
+    def _handle_weather_lookup_events(
+        self, correlation_id: Optional[str], request: EventRequest, timestamp: int, points: List[Record]
+    ) -> None:
         """Handle weather event lookup timer events, appending any points to be persisted to InfluxDB."""
-        if request.event_data.filter(event_type=EventType.TIMER_EVENT, predicate=is_weather_lookup):
-            with SmartThings(request=request):
-                location = retrieve_location()
-                if location.country_code == "USA" and location.latitude is not None and location.longitude is not None:
-                    try:
-                        temperature, humidity = retrieve_current_conditions(location.latitude, location.longitude)
-                        if temperature:
-                            points.append(Point("weather").tag("location", location.location_id).field("temperature", temperature))
-                        if humidity:
-                            points.append(Point("weather").tag("location", location.location_id).field("humidity", humidity))
-                    except RestClientError as e:
-                        logging.error("[%s] Call to weather.gov failed: %s", correlation_id, e.message)
-                    except RestDataError as e:
-                        logging.error("[%s] Call to weather.gov failed: %s", correlation_id, e.message)
-                    except requests.RequestException as e:
-                        # it's hard to get any other specifics from the exception, so we just go with the exception type
-                        logging.error("[%s] Call to weather.gov failed: %s", correlation_id, type(e).__name__)
-
-    def _handle_sensor_events(self, request: EventRequest, points: List[Point]) -> None:
+        if not request.event_data.filter(event_type=EventType.TIMER_EVENT, predicate=is_weather_lookup):
+            return  # the common case, since most requests contain only device events
+        with SmartThings(request=request):
+            location = retrieve_location()
+        if location.country_code == "USA" and location.latitude is not None and location.longitude is not None:
+            try:
+                temperature, humidity = retrieve_current_conditions(location.latitude, location.longitude)
+                location_id = location.location_id
+                # Note: the type stubs declare Point.time() as accepting numbers.Integral, which mypy won't match to int
+                if temperature:
+                    point = Point(WEATHER_MEASUREMENT).tag("location", location_id).field("temperature", temperature)
+                    points.append(point.time(timestamp))  # type: ignore[arg-type]
+                if humidity:
+                    point = Point(WEATHER_MEASUREMENT).tag("location", location_id).field("humidity", humidity)
+                    points.append(point.time(timestamp))  # type: ignore[arg-type]
+            except RestClientError as e:
+                logging.error("[%s] Call to weather.gov failed: %s", correlation_id, e.message)
+            except RestDataError as e:
+                logging.error("[%s] Call to weather.gov failed: %s", correlation_id, e.message)
+            except requests.RequestException as e:
+                # it's hard to get any other specifics from the exception, so we just go with the exception type
+                logging.error("[%s] Call to weather.gov failed: %s", correlation_id, type(e).__name__)
+
+    def _handle_sensor_events(self, request: EventRequest, timestamp: int, points: List[Record]) -> None:
         """Handle received events from sensors, appending any points to be persisted to InfluxDB."""
-        for event in request.event_data.filter(event_type=EventType.DEVICE_EVENT):
-            location_id = event["locationId"]
-            device_id = event["deviceId"]
-            attribute = event["attribute"]  # "temperature" or "humidity"
-            measurement = round(float(event["value"]), 2)
-            points.append(Point("sensor").tag("location", location_id).tag("device", device_id).field(attribute, measurement))
+        # Line protocol is built directly, since there's significant overhead in building a Point for every event
+        events = request.event_data.filter(event_type=EventType.DEVICE_EVENT)
+        records = (sensor_record(event, timestamp) for event in events)
+        points.extend(record for record in records if record is not None)
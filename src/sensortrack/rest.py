@@ -13,7 +13,7 @@ from requests import ConnectionError as RequestsConnectionError
 from requests.exceptions import ConnectionError as RequestsConnectionError
 from requests.exceptions import HTTPError
 from tenacity import retry
-from tenacity.retry import retry_if_exception_type
+from tenacity.retry import retry_if_exception
 from tenacity.stop import stop_after_attempt
 from tenacity.wait import wait_exponential
 
@@ -25,6 +25,7 @@ class RestClientError(Exception):
     message: str
     request_body: Optional[Union[bytes, str]] = None
     response_body: Optional[str] = None
+    status_code: Optional[int] = None
 
 
 @frozen
@@ -43,13 +44,22 @@ def raise_for_status(response: requests.Response) -> None:
             message="Failed API call [%s %s]: %s" % (response.request.method, response.request.url, e),
             request_body=response.request.body,
             response_body=response.text,
+            status_code=response.status_code,
         ) from e
 
 
+def is_retryable(e: BaseException) -> bool:
+    """Whether a failed API call is worth retrying; client errors other than 429 (Too Many Requests) never succeed on retry."""
+    if isinstance(e, RestClientError):
+        return e.status_code is None or e.status_code >= 500 or e.status_code == 429
+    return isinstance(e, (RequestsConnectionError, HTTPError))
+
+
 # This configures 4 retries (5 total attempts), waiting 0.25 seconds before first
-# retry, and limiting the wait between retries to 2 seconds.
+# retry, and limiting the wait between retries to 2 seconds.  Errors that can't
+# succeed on retry are raised immediately.
 DECAYING_RETRY = retry(
     stop=stop_after_attempt(5),
     wait=wait_exponential(multiplier=0.25, max=2),
-    retry=retry_if_exception_type((RestClientError, RequestsConnectionError, HTTPError)),
+    retry=retry_if_exception(is_retryable),
 )
@@ -4,11 +4,11 @@
 """
 The RESTful API.
 """
-import codecs
 import logging
 from importlib.metadata import version as metadata_version
 
 from fastapi import FastAPI, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from influxdb_client.client.exceptions import InfluxDBError
 from pydantic import BaseModel, Field  # pylint: disable=no-name-in-module:
 from smartapp.interface import BadRequestError, SignatureError, SmartAppError, SmartAppRequestContext
@@ -33,43 +33,46 @@ class Version(BaseModel):
     api: str = Field(...)
 
 
-def _generic_error_handler(e: Exception, status_code: int, message: str) -> Response:
+# Error responses have no body and are never modified once built, so they can be shared
+_BAD_REQUEST = Response(status_code=400)
+_UNAUTHORIZED = Response(status_code=401)
+_INTERNAL_ERROR = Response(status_code=500)
+
+
+def _generic_error_handler(e: Exception, response: Response, message: str) -> Response:
     """Generic error handle that properly logs the entire exception context."""
-    try:
-        raise e
-    except:  # pylint: disable=bare-except:
-        logging.exception(message)
-    return Response(status_code=status_code)
+    logging.error(message, exc_info=e)
+    return response
 
 
 @API.exception_handler(BadRequestError)
 async def bad_request_handler(_: Request, e: BadRequestError) -> Response:
-    return _generic_error_handler(e, 400, "[%s] Bad request: %s" % (e.correlation_id, e))
+    return _generic_error_handler(e, _BAD_REQUEST, "[%s] Bad request: %s" % (e.correlation_id, e))
 
 
 @API.exception_handler(SignatureError)
 async def signature_error_handler(_: Request, e: SignatureError) -> Response:
-    return _generic_error_handler(e, 401, "[%s] Signature error: %s" % (e.correlation_id, e))
+    return _generic_error_handler(e, _UNAUTHORIZED, "[%s] Signature error: %s" % (e.correlation_id, e))
 
 
 @API.exception_handler(SmartAppError)
 async def smartapp_error_handler(_: Request, e: SmartAppError) -> Response:
-    return _generic_error_handler(e, 500, "[%s] SmartApp error: %s" % (e.correlation_id, e))
+    return _generic_error_handler(e, _INTERNAL_ERROR, "[%s] SmartApp error: %s" % (e.correlation_id, e))
 
 
 @API.exception_handler(RestClientError)
 async def rest_client_error_handler(_: Request, e: RestClientError) -> Response:
-    return _generic_error_handler(e, 500, "%s" % e)
+    return _generic_error_handler(e, _INTERNAL_ERROR, "%s" % e)
 
 
 @API.exception_handler(InfluxDBError)
 async def influxdb_error_handler(_: Request, e: SmartAppError) -> Response:
-    return _generic_error_handler(e, 500, "InfluxDB error: %s" % e)
+    return _generic_error_handler(e, _INTERNAL_ERROR, "InfluxDB error: %s" % e)
 
 
 @API.exception_handler(Exception)
 async def exception_handler(_: Request, e: Exception) -> Response:
-    return _generic_error_handler(e, 500, "Internal error: %s" % e)
+    return _generic_error_handler(e, _INTERNAL_ERROR, "Internal error: %s" % e)
 
 
 @API.get("/health")
@@ -88,7 +91,7 @@ async def version() -> Version:
 async def smartapp(request: Request) -> Response:
     """Handle the SmartApp lifecycle requests via the dispatcher implementation."""
     headers = request.headers
-    body = codecs.decode(await request.body(), "UTF-8")
+    body = (await request.body()).decode("utf-8")
     context = SmartAppRequestContext(headers=headers, body=body)
-    content = dispatcher().dispatch(context=context)
+    content = await run_in_threadpool(dispatcher().dispatch, context=context)  # dispatch makes blocking HTTP calls
     return Response(status_code=200, content=content, media_type="application/json")
@@ -6,6 +6,7 @@
 SmartThings API client
 """
 from contextvars import ContextVar
+from http.cookiejar import DefaultCookiePolicy
 from typing import Dict, Optional, Union
 
 import requests
@@ -18,6 +19,18 @@ from sensortrack.rest import DECAYING_RETRY, raise_for_status
 
 _CLIENT_TIMEOUT_SEC = 5.0  # we want some fairly large timeout so that requests can't hang forever
 
+# Shared across all requests, so connections to the SmartThings API are pooled and kept alive.  Since the session
+# is used on behalf of every installed app, it must never keep cookies that one app's responses might set.
+_SESSION = requests.Session()
+_SESSION.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+# Headers sent with every API call, other than the Authorization header that varies by token
+_HEADERS = {
+    "Accept": "application/vnd.smartthings+json;v=1",
+    "Accept-Language": "en_US",
+    "Content-Type": "application/json",
+}
+
 
 @frozen(kw_only=True)
 class Location:
@@ -32,6 +45,7 @@ class Location:
 
 @frozen(kw_only=True)
 class SmartThingsApiContext:
+    base_url: str
     token: str
     app_id: str
     location_id: str
@@ -40,12 +54,7 @@ class SmartThingsApiContext:
     # noinspection PyUnresolvedReferences
     @headers.default
     def _default_headers(self) -> Dict[str, str]:
-        return {
-            "Accept": "application/vnd.smartthings+json;v=1",
-            "Accept-Language": "en_US",
-            "Content-Type": "application/json",
-            "Authorization": "Bearer %s" % self.token,
-        }
+        return {**_HEADERS, "Authorization": "Bearer %s" % self.token}
 
 
 # Context managed by the SmartThings context manager
@@ -55,9 +64,12 @@ CONTEXT: ContextVar[SmartThingsApiContext] = ContextVar("CONTEXT")
 class SmartThings:
     """Context manager for SmartThings API."""
 
+    __slots__ = ["context"]
+
     def __init__(self, request: Union[InstallRequest, UpdateRequest, EventRequest]) -> None:
         self.context = CONTEXT.set(
             SmartThingsApiContext(
+                base_url=config().smartthings.base_url,  # captured once, rather than for every API call
                 token=request.token(),
                 app_id=request.app_id(),
                 location_id=request.location_id(),
@@ -71,36 +83,36 @@ class SmartThings:
         CONTEXT.reset(self.context)
 
 
-def _url(endpoint: str) -> str:
+def _url(context: SmartThingsApiContext, endpoint: str) -> str:
     """Build a URL based on API configuration."""
-    return "%s%s" % (config().smartthings.base_url, endpoint)
+    return "%s%s" % (context.base_url, endpoint)
 
 
 @DECAYING_RETRY
-def _delete_weather_lookup_timer(name: str) -> None:
+def _delete_weather_lookup_timer(context: SmartThingsApiContext, name: str) -> None:
     """Delete the weather lookup scheduled task."""
-    url = _url("/installedapps/%s/schedules/%s" % (CONTEXT.get().app_id, name))
-    response = requests.delete(url=url, headers=CONTEXT.get().headers, timeout=_CLIENT_TIMEOUT_SEC)
+    url = _url(context, "/installedapps/%s/schedules/%s" % (context.app_id, name))
+    response = _SESSION.delete(url=url, headers=context.headers, timeout=_CLIENT_TIMEOUT_SEC)
     raise_for_status(response)
 
 
 @DECAYING_RETRY
-def _create_weather_lookup_timer(name: str, cron: str) -> None:
+def _create_weather_lookup_timer(context: SmartThingsApiContext, name: str, cron: str) -> None:
     """Create the weather lookup scheduled task."""
-    url = _url("/installedapps/%s/schedules" % CONTEXT.get().app_id)
+    url = _url(context, "/installedapps/%s/schedules" % context.app_id)
     request = {"name": name, "cron": {"expression": cron, "timezone": "UTC"}}
-    response = requests.post(url=url, headers=CONTEXT.get().headers, json=request, timeout=_CLIENT_TIMEOUT_SEC)
+    response = _SESSION.post(url=url, headers=context.headers, json=request, timeout=_CLIENT_TIMEOUT_SEC)
     raise_for_status(response)
 
 
 @DECAYING_RETRY
-def _subscribe_to_event(capability: str, attribute: str) -> None:
+def _subscribe_to_event(context: SmartThingsApiContext, capability: str, attribute: str) -> None:
     """Subscribe to an event by capability."""
-    url = _url("/installedapps/%s/subscriptions" % CONTEXT.get().app_id)
+    url = _url(context, "/installedapps/%s/subscriptions" % context.app_id)
     request = {
         "sourceType": "CAPABILITY",
         "capability": {
-            "locationId": CONTEXT.get().location_id,
+            "locationId": context.location_id,
             "capability": capability,
             "attribute": attribute,
             "value": "*",
@@ -108,7 +120,7 @@ def _subscribe_to_event(capability: str, attribute: str) -> None:
             "subscriptionName": "all-%s" % capability,  # note: limited to 36 characters
         },
     }
-    response = requests.post(url=url, headers=CONTEXT.get().headers, json=request, timeout=_CLIENT_TIMEOUT_SEC)
+    response = _SESSION.post(url=url, headers=context.headers, json=request, timeout=_CLIENT_TIMEOUT_SEC)
     raise_for_status(response)
 
 
@@ -118,31 +130,37 @@ def _subscribe_to_event(capability: str, attribute: str) -> None:
 
 
 @DECAYING_RETRY
-def _retrieve_location(location_id: str) -> Location:
-    """Retrieve details about a specific location, broken out to facilitate caching."""
-    url = _url("/locations/%s" % location_id)
-    response = requests.get(url=url, headers=CONTEXT.get().headers, timeout=_CLIENT_TIMEOUT_SEC)
+def _retrieve_location(context: SmartThingsApiContext) -> Location:
+    """Retrieve details about the location associated with the API context."""
+    url = _url(context, "/locations/%s" % context.location_id)
+    response = _SESSION.get(url=url, headers=context.headers, timeout=_CLIENT_TIMEOUT_SEC)
     raise_for_status(response)
     return CONVERTER.from_json(response.text, Location)
 
 
+# The public functions below read the API context set by the SmartThings context
+# manager once, and pass it explicitly to the functions that make API calls.
+
+
 def retrieve_location() -> Location:
     """Retrieve details about the location."""
-    return _retrieve_location(CONTEXT.get().location_id)
+    return _retrieve_location(CONTEXT.get())
 
 
-def schedule_weather_lookup_timer(name: str, enabled: bool, cron: Optional[str]) -> None:
+def schedule_weather_lookup_timer(name: str, enabled: bool, cron: Optional[str], replace: bool = True) -> None:
     """Create or replace the weather lookup timer for a given cron expression."""
-    _delete_weather_lookup_timer(name)
+    context = CONTEXT.get()
+    if replace:  # there is nothing to delete for a newly-installed app, so the caller can skip the API call
+        _delete_weather_lookup_timer(context, name)
     if enabled and cron:
-        _create_weather_lookup_timer(name, cron)
+        _create_weather_lookup_timer(context, name, cron)
 
 
 def subscribe_to_temperature_events() -> None:
     """Subscribe to temperature events by capability."""
-    _subscribe_to_event("temperatureMeasurement", "temperature")
+    _subscribe_to_event(CONTEXT.get(), "temperatureMeasurement", "temperature")
 
 
 def subscribe_to_humidity_events() -> None:
     """Subscribe to humidity events by capability."""
-    _subscribe_to_event("relativeHumidityMeasurement", "humidity")
+    _subscribe_to_event(CONTEXT.get(), "relativeHumidityMeasurement", "humidity")
@@ -23,10 +23,9 @@ See: https://weather-gov.github.io/api/general-faqs
 """
 from __future__ import annotations  # so we can return a type from one of its own methods
 
-from typing import Any, Dict, Optional, Tuple
+from http.cookiejar import DefaultCookiePolicy
+from typing import Any, Optional, Tuple
 
-import jsonpath_ng
-import pytemperature
 import requests
 
 from sensortrack.config import config
@@ -34,41 +33,46 @@ from sensortrack.rest import DECAYING_RETRY, RestDataError, raise_for_status
 
 _CLIENT_TIMEOUT_SEC = 5.0  # we want some fairly large timeout so that requests can't hang forever
 
+# Shared across all requests, so connections to the weather API are pooled and kept alive.  Since the session
+# is used on behalf of every installed app, it must never keep cookies that one app's responses might set.
+_SESSION = requests.Session()
+_SESSION.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
 
-def _url(endpoint: str) -> str:
+
+def _url(base_url: str, endpoint: str) -> str:
     """Build a URL based on API configuration."""
-    return "%s%s" % (config().weather.base_url, endpoint)
+    return "%s%s" % (base_url, endpoint)
 
 
-def _extract_float(json: Dict[str, Any], jsonpath: str) -> float:
-    """Extract a float from a JSON document using jsonpath."""
-    return jsonpath_ng.parse(jsonpath).find(json)[0].value  # type: ignore
+def _c2f(celsius: float) -> float:
+    """Convert a temperature in degrees C to degrees F, rounded to 2 decimal places."""
+    return round(celsius * 9.0 / 5.0 + 32.0, 2)
 
 
-def _extract_temperature(response: requests.Response) -> Optional[float]:
-    """Extract temperature from the response, returning None if it can't be extracted."""
+def _extract_temperature(body: Any) -> Optional[float]:
+    """Extract temperature from the response body, returning None if it can't be extracted."""
     try:
-        return pytemperature.c2f(_extract_float(response.json(), "$.properties.temperature.value"))  # type: ignore
+        return _c2f(float(body["properties"]["temperature"]["value"]))
     except:  # pylint: disable=bare-except:
         return None
 
 
-def _extract_humidity(response: requests.Response) -> Optional[float]:
-    """Extract humidity from the response, returning None if it can't be extracted."""
+def _extract_humidity(body: Any) -> Optional[float]:
+    """Extract humidity from the response body, returning None if it can't be extracted."""
     try:
-        return round(float(_extract_float(response.json(), "$.properties.relativeHumidity.value")), 2)
+        return round(float(body["properties"]["relativeHumidity"]["value"]), 2)
     except:  # pylint: disable=bare-except:
         return None
 
 
 @DECAYING_RETRY
-def _retrieve_station_url(latitude: float, longitude: float) -> str:
+def _retrieve_station_url(base_url: str, latitude: float, longitude: float) -> str:
     """Retrieve the station URL for the closest station to a latitude and longitude."""
-    url = _url("/points/%s,%s/stations" % (latitude, longitude))
-    response = requests.get(url=url, timeout=_CLIENT_TIMEOUT_SEC)
+    url = _url(base_url, "/points/%s,%s/stations" % (latitude, longitude))
+    response = _SESSION.get(url=url, timeout=_CLIENT_TIMEOUT_SEC)
     raise_for_status(response)
     try:
-        return str(_extract_float(response.json(), "$.features[0].id"))
+        return str(response.json()["features"][0]["id"])
     except Exception as e:  # pylint: disable=bare-except
         raise RestDataError("Failed to retrieve any valid stations for %s,%s" % (latitude, longitude)) from e
 
@@ -77,14 +81,19 @@ def _retrieve_station_url(latitude: float, longitude: float) -> str:
 def _retrieve_latest_observation(station_url: str) -> Tuple[Optional[float], Optional[float]]:
     """Return the latest (temperature in F, humidity) observation at a particular station, via its station URL."""
     url = "%s/observations/latest" % station_url
-    response = requests.get(url=url, timeout=_CLIENT_TIMEOUT_SEC)
+    response = _SESSION.get(url=url, timeout=_CLIENT_TIMEOUT_SEC)
     raise_for_status(response)
-    temperature = _extract_temperature(response)
-    humidity = _extract_humidity(response)
+    try:
+        body = response.json()
+    except ValueError:  # an unparseable body is handled the same as one with missing values
+        body = None
+    temperature = _extract_temperature(body)
+    humidity = _extract_humidity(body)
     return temperature, humidity
 
 
 def retrieve_current_conditions(latitude: float, longitude: float) -> Tuple[Optional[float], Optional[float]]:
     """Retrieve current weather conditions a particular lat/long location."""
-    station_url = _retrieve_station_url(latitude, longitude)
+    base_url = config().weather.base_url  # captured once, rather than for every API call
+    station_url = _retrieve_station_url(base_url, latitude, longitude)
     return _retrieve_latest_observation(station_url)
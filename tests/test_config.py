@@ -1,12 +1,22 @@
 # -*- coding: utf-8 -*-
 # vim: set ft=python ts=4 sw=4 expandtab:
 import os
-from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
 
 import pytest
 from smartapp.interface import SmartAppDispatcherConfig
 
-from sensortrack.config import ConfigError, InfluxDbConfig, ServerConfig, SmartThingsApiConfig, WeatherApiConfig, config, reset
+from sensortrack.config import (
+    ConfigError,
+    InfluxDbConfig,
+    ServerConfig,
+    SmartThingsApiConfig,
+    WeatherApiConfig,
+    _replace_envvars,
+    config,
+    reset,
+)
 
 
 def fixture(filename: str) -> str:
@@ -86,6 +96,60 @@ class TestConfig:
         with pytest.raises(ConfigError, match=r"Server configuration is not readable: bogus"):
             config()
 
+    @patch.dict(
+        os.environ,
+        {
+            "SENSORTRACK_CONFIG_PATH": os.path.dirname(APPLICATION_YAML),
+        },
+        clear=True,
+    )
+    def test_config_env_not_file(self):
+        with pytest.raises(ConfigError, match=r"Server configuration is not readable: .*config"):
+            config()
+
+    @patch.dict(
+        os.environ,
+        {
+            "SENSORTRACK_CONFIG_PATH": APPLICATION_YAML,
+            "SENSORTRACK_INFLUXDB_URL": INFLUXDB_URL,
+            "SENSORTRACK_INFLUXDB_ORG": INFLUXDB_ORG,
+            "SENSORTRACK_INFLUXDB_BUCKET": INFLUXDB_BUCKET,
+        },
+        clear=True,
+    )
+    def test_config_env_missing_var(self):
+        with pytest.raises(ConfigError, match=r"environment variable SENSORTRACK_INFLUXDB_TOKEN, which is not set"):
+            config()
+
+    @patch.dict(os.environ, {"ONE": "1", "TWO": "2"}, clear=True)
+    @pytest.mark.parametrize(
+        "source,expected",
+        [
+            ("", ""),
+            ("value: {ONE}", "value: 1"),
+            ("{ONE}{TWO} {ONE}", "12 1"),
+            ("value: { ONE }", "value: { ONE }"),
+            ("value: {a: b}", "value: {a: b}"),
+            ("value: {{ONE}}", "value: {1}"),
+        ],
+    )
+    def test_replace_envvars(self, source, expected):
+        assert _replace_envvars(source) == expected
+
+    @patch.dict(os.environ, {"ONE": "1"}, clear=True)
+    def test_replace_envvars_unset(self):
+        with pytest.raises(ConfigError, match=r"environment variable UNKNOWN, which is not set"):
+            _replace_envvars("value: {ONE} {UNKNOWN}")
+
+    @patch("sensortrack.config._load_config")
+    def test_config_concurrent(self, load_config):
+        loaded = MagicMock()
+        load_config.return_value = loaded
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: config(), range(32)))
+        assert all(result is loaded for result in results)
+        load_config.assert_called_once()
+
     @staticmethod
     def _validate_config(result):
         assert result == ServerConfig(
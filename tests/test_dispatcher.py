@@ -17,9 +17,12 @@ class TestDispatcher:
         yield
         reset()
 
+    @patch("sensortrack.handler.InfluxDBClient")
+    @patch("sensortrack.handler.config")
     @patch("sensortrack.dispatcher.config")
-    def test_dispatcher(self, config):
+    def test_dispatcher(self, config, handler_config, _):
         config.return_value = MagicMock(dispatcher=SmartAppDispatcherConfig())
+        handler_config.return_value = MagicMock(influxdb=MagicMock(url="url", org="org", token="token", bucket="bucket"))
 
         # Check that we loaded dispatcher configuration from global state
         assert dispatcher().config is not None
@@ -30,3 +33,19 @@ class TestDispatcher:
 
         # Confirm that event handler is set as expected
         assert isinstance(dispatcher().event_handler, EventHandler)
+
+    @patch("sensortrack.handler.InfluxDBClient")
+    @patch("sensortrack.handler.config")
+    @patch("sensortrack.dispatcher.config")
+    def test_reset_closes_event_handler(self, config, handler_config, influxdb):
+        config.return_value = MagicMock(dispatcher=SmartAppDispatcherConfig())
+        handler_config.return_value = MagicMock(influxdb=MagicMock(url="url", org="org", token="token", bucket="bucket"))
+        first = dispatcher()
+        influxdb.return_value.close.assert_not_called()
+        reset()
+        influxdb.return_value.write_api.return_value.close.assert_called_once()
+        influxdb.return_value.close.assert_called_once()
+        assert dispatcher() is not first
+
+    def test_reset_not_loaded(self):
+        reset()  # just make sure it doesn't blow up when there's no dispatcher to close
@@ -2,6 +2,8 @@
 # vim: set ft=python ts=4 sw=4 expandtab:
 # pylint: disable=redefined-outer-name,protected-access,too-many-positional-arguments:
 
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
 from typing import List
 from unittest.mock import MagicMock, call, patch
 
@@ -9,14 +11,32 @@ import pytest
 from influxdb_client import Point
 from smartapp.interface import EventType
 
-from sensortrack.handler import WEATHER_LOOKUP, EventHandler, is_weather_lookup
+from sensortrack.handler import (
+    _WRITE_OPTIONS,
+    WEATHER_LOOKUP,
+    EventHandler,
+    _log_write_error,
+    _log_write_retry,
+    is_weather_lookup,
+    sensor_record,
+)
+from sensortrack.rest import RestClientError
 
 CORRELATION_ID = "xxx"
 
 
 @pytest.fixture
 def handler() -> EventHandler:
-    return EventHandler()
+    with patch("sensortrack.handler.config") as config, patch("sensortrack.handler.InfluxDBClient"):
+        config.return_value = MagicMock(
+            influxdb=MagicMock(
+                url="url",
+                org="org",
+                token="token",
+                bucket="bucket",
+            ),
+        )
+        return EventHandler()
 
 
 class TestEventHandler:
@@ -33,6 +53,57 @@ class TestEventHandler:
     def test_is_weather_lookup(self, event, expected):
         assert is_weather_lookup(event) is expected
 
+    @pytest.mark.parametrize(
+        "event,expected",
+        [
+            ({"locationId": "l", "deviceId": "d", "attribute": "t", "value": 23.7}, "sensor,device=d,location=l t=23.7 1"),
+            ({"locationId": "l", "deviceId": "d", "attribute": "h", "value": "41.594"}, "sensor,device=d,location=l h=41.59 1"),
+            ({"locationId": "l", "deviceId": "d", "attribute": "h", "value": 41}, "sensor,device=d,location=l h=41.0 1"),
+            ({"locationId": "l", "deviceId": "d", "attribute": "t", "value": -3.456}, "sensor,device=d,location=l t=-3.46 1"),
+            ({"locationId": "l", "deviceId": "d", "attribute": "t", "value": "-0.001"}, "sensor,device=d,location=l t=0.0 1"),
+            ({"locationId": "l", "deviceId": "d", "attribute": "t", "value": 1e307}, "sensor,device=d,location=l t=1e+307 1"),
+            ({"locationId": "l", "deviceId": "d", "attribute": "t", "value": "-1e307"}, "sensor,device=d,location=l t=-1e+307 1"),
+            (
+                {"locationId": "a b", "deviceId": "c,d", "attribute": "=", "value": 1},
+                "sensor,device=c\\,d,location=a\\ b \\==1.0 1",
+            ),
+            (
+                {"locationId": "l", "deviceId": "d\n\t\r", "attribute": "t", "value": 1},
+                "sensor,device=d\\n\\t\\r,location=l t=1.0 1",
+            ),
+            ({"locationId": "l", "deviceId": "d\\", "attribute": "t", "value": 1}, "sensor,device=d\\ ,location=l t=1.0 1"),
+            ({"locationId": "", "deviceId": "d", "attribute": "t", "value": 1}, "sensor,device=d t=1.0 1"),
+            ({"locationId": "l", "deviceId": None, "attribute": "t", "value": 1}, "sensor,location=l t=1.0 1"),
+            ({"locationId": None, "deviceId": "", "attribute": "t", "value": 1}, "sensor t=1.0 1"),
+            ({"locationId": "l", "deviceId": "d", "attribute": "t", "value": "nan"}, None),
+            ({"locationId": "l", "deviceId": "d", "attribute": "t", "value": float("inf")}, None),
+        ],
+    )
+    def test_sensor_record(self, event, expected):
+        assert sensor_record(event, 1) == expected
+
+    @patch("sensortrack.handler.InfluxDBClient")
+    @patch("sensortrack.handler.config")
+    def test_init_and_close(self, config, influxdb):
+        config.return_value = MagicMock(influxdb=MagicMock(url="url", org="org", token="token", bucket="bucket"))
+        handler = EventHandler()
+        influxdb.assert_called_once_with(url="url", org="org", token="token")
+        influxdb.return_value.write_api.assert_called_once_with(
+            write_options=_WRITE_OPTIONS,
+            error_callback=_log_write_error,
+            retry_callback=_log_write_retry,
+        )
+        handler.close()
+        influxdb.return_value.write_api.return_value.close.assert_called_once()
+        influxdb.return_value.close.assert_called_once()
+
+    def test_log_write_error(self, caplog):
+        data = b"sensor,device=d,location=l t=1.0 1\nsensor,device=d,location=l h=2.0 1"
+        _log_write_error(("bucket", "org", "ns"), data, Exception("hello"))
+        assert caplog.messages == [
+            "Failed to persist batch of 2 point(s) to InfluxDB [bucket=bucket, org=org, precision=ns]: hello"
+        ]
+
     def test_handle_confirmation(self, handler):
         handler.handle_confirmation(CORRELATION_ID, MagicMock())  # just make sure it doesn't blow up
 
@@ -64,7 +135,7 @@ class TestEventHandler:
         handler.handle_install(CORRELATION_ID, request)
 
         smartthings.assert_called_once_with(request=request)
-        schedule.assert_called_once_with(WEATHER_LOOKUP, enabled, provided)
+        schedule.assert_called_once_with(WEATHER_LOOKUP, enabled, provided, replace=False)
         temperature.assert_called_once()
         humidity.assert_called_once()
         request.as_bool.assert_called_once_with("retrieve-weather-enabled")
@@ -73,6 +144,19 @@ class TestEventHandler:
         else:
             request.as_str.assert_not_called()
 
+    @patch("sensortrack.handler.subscribe_to_temperature_events")
+    @patch("sensortrack.handler.subscribe_to_humidity_events")
+    @patch("sensortrack.handler.schedule_weather_lookup_timer")
+    @patch("sensortrack.handler.SmartThings")
+    def test_handle_install_subscribe_failure(self, _, __, humidity, temperature, handler):
+        request = MagicMock()
+        request.as_bool = MagicMock(return_value=False)
+        temperature.side_effect = RestClientError("hello")
+        with pytest.raises(RestClientError):
+            handler.handle_install(CORRELATION_ID, request)
+        temperature.assert_called_once()
+        humidity.assert_called_once()
+
     @patch("sensortrack.handler.subscribe_to_temperature_events")
     @patch("sensortrack.handler.subscribe_to_humidity_events")
     @patch("sensortrack.handler.schedule_weather_lookup_timer")
@@ -94,7 +178,7 @@ class TestEventHandler:
         handler.handle_update(CORRELATION_ID, request)
 
         smartthings.assert_called_once_with(request=request)
-        schedule.assert_called_once_with(WEATHER_LOOKUP, enabled, provided)
+        schedule.assert_called_once_with(WEATHER_LOOKUP, enabled, provided, replace=True)
         temperature.assert_not_called()
         humidity.assert_not_called()
         request.as_bool.assert_called_once_with("retrieve-weather-enabled")
@@ -103,9 +187,8 @@ class TestEventHandler:
         else:
             request.as_str.assert_not_called()
 
-    @patch("sensortrack.handler.InfluxDBClient")
-    @patch("sensortrack.handler.config")
-    def test_handle_event_device(self, config, influxdb, handler):
+    @patch("sensortrack.handler.time")
+    def test_handle_event_device(self, time, handler):
         request = MagicMock()
         request.event_data = MagicMock()
         request.event_data.filter = MagicMock()
@@ -124,30 +207,12 @@ class TestEventHandler:
             ],
         ]
 
-        config.return_value = MagicMock(
-            influxdb=MagicMock(
-                url="url",
-                org="org",
-                token="token",
-                bucket="bucket",
-            ),
-        )
+        time.time_ns.return_value = 1234
 
-        # Ugh, the stubbing for a context manager is hideous
-        write = MagicMock()
-        influxdb.return_value = MagicMock(
-            __enter__=MagicMock(
-                return_value=MagicMock(
-                    write_api=MagicMock(
-                        return_value=MagicMock(write=write),
-                    ),
-                ),
-            ),
-        )
+        write = handler._write_api.write
 
         handler.handle_event(CORRELATION_ID, request)
 
-        influxdb.assert_called_once_with(url="url", org="org", token="token")
         request.event_data.filter.assert_has_calls(
             [
                 call(event_type=EventType.TIMER_EVENT, predicate=is_weather_lookup),
@@ -155,24 +220,36 @@ class TestEventHandler:
             ]
         )
 
-        # there's no equality available on the Point class, so we have to do this the hard way
-        (_, kwargs) = write.call_args
-        bucket: str = kwargs["bucket"]
-        points: List[Point] = kwargs["record"]
-        assert bucket == "bucket"
-        assert len(points) == 1
-        assert len(points[0]._tags) == 2
-        assert len(points[0]._fields) == 1
-        assert points[0]._name == "sensor"
-        assert points[0]._tags["location"] == "l"
-        assert points[0]._tags["device"] == "d"
-        assert points[0]._fields["t"] == 23.7
+        write.assert_called_once_with(bucket="bucket", record=["sensor,device=d,location=l t=23.7 1234"])
+
+    def test_handle_event_concurrent(self, handler):
+        request = MagicMock()
+        request.event_data.filter.return_value = []  # no timer events and no device events
+
+        # The batching write API is not safe to call from several threads at once, so writes must be serialized
+        active = []
+        concurrent = []
+
+        def write(**_):
+            active.append(None)
+            concurrent.append(len(active))
+            sleep(0.001)
+            active.pop()
 
+        write_api = handler._write_api
+        write_api.write.side_effect = write
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for future in [executor.submit(handler.handle_event, CORRELATION_ID, request) for _ in range(64)]:
+                future.result()
+
+        assert write_api.write.call_count == 64
+        assert max(concurrent) == 1
+
+    @patch("sensortrack.handler.time")
     @patch("sensortrack.handler.retrieve_current_conditions")
     @patch("sensortrack.handler.retrieve_location")
     @patch("sensortrack.handler.SmartThings")
-    @patch("sensortrack.handler.InfluxDBClient")
-    @patch("sensortrack.handler.config")
     @pytest.mark.parametrize(
         "location,eligible",
         [
@@ -185,7 +262,7 @@ class TestEventHandler:
         ],
     )
     def test_handle_event_timer(
-        self, config, influxdb, smartthings, retrieve_location, retrieve_current_conditions, handler, location, eligible
+        self, smartthings, retrieve_location, retrieve_current_conditions, time, handler, location, eligible
     ):
         request = MagicMock()
         request.event_data = MagicMock()
@@ -202,29 +279,11 @@ class TestEventHandler:
             [],
         ]
 
-        config.return_value = MagicMock(
-            influxdb=MagicMock(
-                url="url",
-                org="org",
-                token="token",
-                bucket="bucket",
-            ),
-        )
-
         retrieve_location.return_value = location
         retrieve_current_conditions.return_value = 78.9, 10.2
+        time.time_ns.return_value = 1234
 
-        # Ugh, the stubbing for a context manager is hideous
-        write = MagicMock()
-        influxdb.return_value = MagicMock(
-            __enter__=MagicMock(
-                return_value=MagicMock(
-                    write_api=MagicMock(
-                        return_value=MagicMock(write=write),
-                    ),
-                ),
-            ),
-        )
+        write = handler._write_api.write
 
         handler.handle_event(CORRELATION_ID, request)
 
@@ -235,7 +294,6 @@ class TestEventHandler:
             ]
         )
 
-        influxdb.assert_called_once_with(url="url", org="org", token="token")
         smartthings.assert_called_once_with(request=request)
         retrieve_location.assert_called_once()
         if eligible:
@@ -255,10 +313,12 @@ class TestEventHandler:
             assert points[0]._name == "weather"
             assert points[0]._tags["location"] == "l"
             assert points[0]._fields["temperature"] == 78.9
+            assert points[0]._time == 1234
             assert len(points[1]._tags) == 1
             assert len(points[1]._fields) == 1
             assert points[1]._name == "weather"
             assert points[1]._tags["location"] == "l"
             assert points[1]._fields["humidity"] == 10.2
+            assert points[1]._time == 1234
         else:
             assert len(points) == 0
@@ -3,18 +3,39 @@
 from unittest.mock import MagicMock
 
 import pytest
+from requests.exceptions import ConnectionError as RequestsConnectionError
 from requests.exceptions import HTTPError
 
-from sensortrack.rest import RestClientError, raise_for_status
+from sensortrack.rest import RestClientError, RestDataError, is_retryable, raise_for_status
 
 
 class TestFunctions:
     def test_raise_for_status(self):
         request = MagicMock(body="request")
-        response = MagicMock(request=request, text="response")
+        response = MagicMock(request=request, text="response", status_code=404)
         response.raise_for_status = MagicMock()
         response.raise_for_status.side_effect = HTTPError("hello")
         with pytest.raises(RestClientError) as e:
             raise_for_status(response)
         assert e.value.request_body == "request"
         assert e.value.response_body == "response"
+        assert e.value.status_code == 404
+
+    @pytest.mark.parametrize(
+        "exception,expected",
+        [
+            (RestClientError("hello"), True),
+            (RestClientError("hello", status_code=500), True),
+            (RestClientError("hello", status_code=503), True),
+            (RestClientError("hello", status_code=429), True),
+            (RestClientError("hello", status_code=400), False),
+            (RestClientError("hello", status_code=401), False),
+            (RestClientError("hello", status_code=404), False),
+            (RequestsConnectionError("hello"), True),
+            (HTTPError("hello"), True),
+            (RestDataError("hello"), False),
+            (ValueError("hello"), False),
+        ],
+    )
+    def test_is_retryable(self, exception, expected):
+        assert is_retryable(exception) is expected
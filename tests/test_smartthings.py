@@ -9,7 +9,9 @@ import responses
 from responses import matchers
 from responses.registries import OrderedRegistry
 
+from sensortrack.rest import RestClientError
 from sensortrack.smartthings import (
+    _SESSION,
     Location,
     SmartThings,
     retrieve_location,
@@ -101,6 +103,34 @@ class TestPublicFunctions:
                 )
             assert len(r.calls) == 2  # one for the the failed attempt, one for the retry
 
+    def test_retrieve_location_ignores_cookies(self, config):
+        config.return_value = CONFIG
+        with responses.RequestsMock(registry=OrderedRegistry) as r:
+            r.get(
+                url="https://base/locations/location",
+                status=200,
+                body=load_file(os.path.join(FIXTURE_DIR, "smartthings", "location.json")),
+                headers={"Set-Cookie": "session=secret; Path=/"},
+                match=[TIMEOUT_MATCHER, HEADERS_MATCHER],
+            )
+            with SmartThings(request=REQUEST):
+                retrieve_location()
+            assert len(_SESSION.cookies) == 0  # the session is shared by all installed apps, so it must never keep cookies
+
+    def test_retrieve_location_not_retryable(self, config):
+        config.return_value = CONFIG
+        with responses.RequestsMock(registry=OrderedRegistry) as r:
+            r.get(
+                url="https://base/locations/location",
+                status=404,
+                match=[TIMEOUT_MATCHER, HEADERS_MATCHER],
+            )
+            with SmartThings(request=REQUEST):
+                with pytest.raises(RestClientError) as e:
+                    retrieve_location()
+                assert e.value.status_code == 404
+            assert len(r.calls) == 1  # a client error is never retried
+
     @pytest.mark.parametrize(
         "enabled,cron",
         [
@@ -149,3 +179,17 @@ class TestPublicFunctions:
             with SmartThings(request=REQUEST):
                 schedule_weather_lookup_timer("identifier", True, "expr")
             assert len(r.calls) == 3  # one for the delete, one for the failed post, one for the retry
+
+    def test_schedule_weather_lookup_timer_no_replace(self, config):
+        config.return_value = CONFIG
+        request = {"name": "identifier", "cron": {"expression": "expr", "timezone": "UTC"}}
+        with responses.RequestsMock(registry=OrderedRegistry) as r:
+            r.post(
+                url="https://base/installedapps/app/schedules",
+                status=200,
+                json=request,
+                match=[TIMEOUT_MATCHER, HEADERS_MATCHER],
+            )
+            with SmartThings(request=REQUEST):
+                schedule_weather_lookup_timer("identifier", True, "expr", replace=False)
+            assert len(r.calls) == 1  # no delete, just the post
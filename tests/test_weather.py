@@ -9,7 +9,7 @@ from responses import matchers
 from responses.registries import OrderedRegistry
 
 from sensortrack.rest import RestDataError
-from sensortrack.weather import retrieve_current_conditions
+from sensortrack.weather import _SESSION, retrieve_current_conditions
 from tests.testutil import load_file
 
 FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
@@ -47,6 +47,27 @@ class TestPublicFunctions:
             assert retrieve_current_conditions(latitude=12.3, longitude=45.6) == (84.92, 41.59)
             assert len(r.calls) == 4  # one retry and one success for each endpoint
 
+    @patch("sensortrack.weather.config")
+    def test_retrieve_current_conditions_ignores_cookies(self, config):
+        config.return_value = MagicMock(weather=MagicMock(base_url="https://base"))
+        with responses.RequestsMock(registry=OrderedRegistry) as r:
+            r.get(
+                url="https://base/points/12.3,45.6/stations",
+                status=200,
+                body=load_file(os.path.join(FIXTURE_DIR, "weather/stations", "stations.json")),
+                headers={"Set-Cookie": "session=secret; Path=/"},
+                match=[TIMEOUT_MATCHER],
+            )
+            r.get(
+                url="https://api.weather.gov/stations/KALO/observations/latest",
+                status=200,
+                body=load_file(os.path.join(FIXTURE_DIR, "weather", "observations", "valid.json")),
+                headers={"Set-Cookie": "session=secret; Path=/"},
+                match=[TIMEOUT_MATCHER],
+            )
+            retrieve_current_conditions(latitude=12.3, longitude=45.6)
+            assert len(_SESSION.cookies) == 0  # the session is shared by all installed apps, so it must never keep cookies
+
     @patch("sensortrack.weather.config")
     def test_retrieve_current_conditions_bad_stations(self, config):
         config.return_value = MagicMock(weather=MagicMock(base_url="https://base"))